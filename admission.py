@@ -0,0 +1,217 @@
+import math
+import os
+import threading
+import time
+import logging
+import psutil
+
+logger = logging.getLogger(__name__)
+
+def _setting(value, env_name, default, cast):
+    # An explicit argument (including 0) wins over the environment
+    if value is not None:
+        return value
+    return cast(os.environ.get(env_name, default))
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted under the current work budget"""
+    def __init__(self, message, status_code=429, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class JobTicket:
+    def __init__(self, job_id, cost, memory_bytes, rss_at_start, estimated_cost=None):
+        self.job_id = job_id
+        self.cost = cost                  # reserved share of the work budget, in megapixels
+        self.memory_bytes = memory_bytes  # reserved memory estimate
+        # Full estimate, which can exceed the reservation for a job admitted to run alone
+        self.estimated_cost = cost if estimated_cost is None else estimated_cost
+        self.rss_at_start = rss_at_start
+        self.start_time = time.time()
+
+
+class AdmissionController:
+    def __init__(self, max_cost=None, max_memory_mb=None, job_base_memory_mb=None,
+                 frame_buffers=None, default_retry_after=None, max_retry_after=300,
+                 min_job_cost=None, decode_weight=None):
+        # Budgets can be tuned per deployment through environment variables
+        self.max_cost = _setting(max_cost, "ADMISSION_MAX_MEGAPIXELS", 10000, float)
+        max_memory_mb = _setting(max_memory_mb, "ADMISSION_MAX_MEMORY_MB", 2048, int)
+        job_base_memory_mb = _setting(job_base_memory_mb, "ADMISSION_JOB_BASE_MEMORY_MB", 256, int)
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.job_base_memory_bytes = job_base_memory_mb * 1024 * 1024
+        self.frame_buffers = _setting(frame_buffers, "ADMISSION_FRAME_BUFFERS", 8, int)
+        self.default_retry_after = _setting(default_retry_after, "ADMISSION_DEFAULT_RETRY_AFTER", 30, int)
+        self.max_retry_after = max_retry_after
+        # Smallest job the early check assumes, before the upload has been probed
+        self.min_job_cost = _setting(min_job_cost, "ADMISSION_MIN_JOB_MEGAPIXELS", 500, float)
+        # Cost of decoding and re-encoding a frame in the speed pass, relative to running the model on it
+        self.decode_weight = _setting(decode_weight, "ADMISSION_DECODE_WEIGHT", 0.2, float)
+
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._inflight_cost = 0.0
+        self._inflight_memory = 0
+        # Aggregate throughput: cost of finished jobs over the wall time the server was busy
+        self._completed_cost = 0.0
+        self._busy_seconds = 0.0
+        self._busy_since = None
+        self._process = psutil.Process(os.getpid())
+        self._baseline_rss = None
+
+    def record_baseline(self):
+        """
+        Record the idle process footprint (interpreter, loaded model) that sits outside the job budget
+        """
+        with self._lock:
+            self._baseline_rss = self._current_rss()
+
+    def estimate_cost(self, video_info):
+        """
+        Estimate the work of a job as frames x resolution, in model-equivalent megapixels
+        Counts the frames left for the model after the speed pass, plus the speed pass itself,
+        which decodes every original frame (weighted by decode_weight). The detector's second
+        speed pass on videos still over a minute is not counted separately; it also shrinks
+        the frames the model sees, so the estimate stays on the safe side.
+        """
+        speed_multiplier = video_info.get('speed_multiplier') or 1
+        model_frames = math.ceil(video_info['frame_count'] / speed_multiplier)
+        decoded_frames = video_info['frame_count'] if speed_multiplier > 1 else 0
+        frames = model_frames + self.decode_weight * decoded_frames
+        return frames * video_info['width'] * video_info['height'] / 1e6
+
+    def estimate_memory(self, video_info):
+        """
+        Estimate the resident memory of a job: model/torch overhead plus decoded BGR frame buffers
+        """
+        frame_bytes = video_info['width'] * video_info['height'] * 3
+        return self.job_base_memory_bytes + frame_bytes * self.frame_buffers
+
+    def has_capacity(self):
+        """
+        Cheap check done before accepting an upload: is there room for at least a minimal job?
+        """
+        with self._lock:
+            return not any(self._overage(*self._min_job()))
+
+    def admit(self, job_id, video_info):
+        """
+        Reserve budget for a job or raise AdmissionRejected
+        A job larger than the whole budget reserves all of it, so it only runs alone
+        Returns: JobTicket to pass to release() once the job is finished
+        """
+        estimated_cost = self.estimate_cost(video_info)
+        cost = min(estimated_cost, self.max_cost)
+        memory_bytes = min(self.estimate_memory(video_info), self.max_memory_bytes)
+
+        with self._lock:
+            if any(self._overage(cost, memory_bytes)):
+                raise AdmissionRejected(
+                    f"Server is at capacity ({len(self._jobs)} jobs in flight), retry later",
+                    retry_after=self._retry_after(cost, memory_bytes)
+                )
+
+            ticket = JobTicket(job_id, cost, memory_bytes, self._current_rss(), estimated_cost)
+            if not self._jobs:
+                self._busy_since = ticket.start_time
+            self._jobs[job_id] = ticket
+            self._inflight_cost += cost
+            self._inflight_memory += memory_bytes
+
+        logger.info(f"Admitted job {job_id}: {estimated_cost:.0f} megapixels, "
+                    f"{memory_bytes / (1024 * 1024):.0f}MB reserved")
+        return ticket
+
+    def release(self, ticket, succeeded=True):
+        """
+        Return a job's budget; only jobs that succeeded count as completed work for throughput
+        """
+        now = time.time()
+        with self._lock:
+            if self._jobs.pop(ticket.job_id, None) is None:
+                return
+            self._inflight_cost -= ticket.cost
+            self._inflight_memory -= ticket.memory_bytes
+            if succeeded:
+                self._completed_cost += ticket.estimated_cost
+            if not self._jobs:
+                self._busy_seconds += now - self._busy_since
+                self._busy_since = None
+            other_jobs = len(self._jobs)
+            rss = self._current_rss()
+
+        # RSS is shared by every job running concurrently, so this is not a per-job figure
+        logger.info(f"Released {'finished' if succeeded else 'failed'} job {ticket.job_id} "
+                    f"after {now - ticket.start_time:.2f}s: "
+                    f"reserved {ticket.memory_bytes / (1024 * 1024):.0f}MB, "
+                    f"process-wide RSS changed by {(rss - ticket.rss_at_start) / (1024 * 1024):+.0f}MB "
+                    f"over the job ({other_jobs} other jobs still in flight)")
+
+    def retry_after(self, cost=None, memory_bytes=None):
+        """
+        Seconds until enough in-flight work drains to fit a job, at the observed aggregate throughput
+        Without a cost or memory estimate, a minimal job is assumed
+        """
+        min_cost, min_memory = self._min_job()
+        cost = min_cost if cost is None else min(cost, self.max_cost)
+        memory_bytes = min_memory if memory_bytes is None else min(memory_bytes, self.max_memory_bytes)
+        with self._lock:
+            return self._retry_after(cost, memory_bytes)
+
+    def stats(self):
+        with self._lock:
+            throughput = self._throughput()
+            return {
+                "jobs_in_flight": len(self._jobs),
+                "inflight_megapixels": round(self._inflight_cost, 1),
+                "max_megapixels": self.max_cost,
+                "reserved_memory_mb": round(self._inflight_memory / (1024 * 1024)),
+                "max_memory_mb": round(self.max_memory_bytes / (1024 * 1024)),
+                "process_rss_mb": round(self._current_rss() / (1024 * 1024)),
+                "throughput_megapixels_per_sec": round(throughput, 1) if throughput else None
+            }
+
+    def _min_job(self):
+        # Capped to the budget so the early check never refuses an idle server
+        return min(self.min_job_cost, self.max_cost), min(self.job_base_memory_bytes, self.max_memory_bytes)
+
+    def _overage(self, cost, memory_bytes):
+        # How far a job would push each budget past its limit: (megapixels, reserved bytes, RSS bytes)
+        over_cost = self._inflight_cost + cost - self.max_cost
+        over_memory = self._inflight_memory + memory_bytes - self.max_memory_bytes
+        # An idle server always admits, so RSS the allocator never returned cannot wedge it
+        over_rss = 0
+        if self._jobs:
+            over_rss = self._current_rss() + memory_bytes - self._rss_limit()
+        return max(over_cost, 0), max(over_memory, 0), max(over_rss, 0)
+
+    def _throughput(self):
+        busy_seconds = self._busy_seconds
+        if self._busy_since is not None:
+            busy_seconds += time.time() - self._busy_since
+        if self._completed_cost <= 0 or busy_seconds <= 0:
+            return None
+        return self._completed_cost / busy_seconds
+
+    def _retry_after(self, cost, memory_bytes):
+        over_cost, over_memory, over_rss = self._overage(cost, memory_bytes)
+        # Memory frees as in-flight jobs finish, so express it as the share of in-flight work to drain
+        drain_cost = over_cost
+        if self._inflight_memory > 0:
+            drain_fraction = min(1, max(over_memory, over_rss) / self._inflight_memory)
+            drain_cost = max(drain_cost, drain_fraction * self._inflight_cost)
+        throughput = self._throughput()
+        if not throughput:
+            return self.default_retry_after
+        return max(1, min(self.max_retry_after, math.ceil(drain_cost / throughput)))
+
+    def _current_rss(self):
+        return self._process.memory_info().rss
+
+    def _rss_limit(self):
+        # Without a baseline there is nothing to compare against, so only the estimates apply
+        if self._baseline_rss is None:
+            return float('inf')
+        return self.max_memory_bytes + self._baseline_rss
@@ -75,11 +75,13 @@ class VideoProcessor:
     def get_video_info(self, video_path):
         """
         Get video information with dynamic speed multiplier
-        Returns: dict containing fps, frame_count, duration, and processing info
+        Returns: dict containing fps, frame_count, resolution, duration, and processing info
         """
         cap = cv2.VideoCapture(video_path)
         fps = int(cap.get(cv2.CAP_PROP_FPS))
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         duration = frame_count / fps
         
         # Get appropriate speed multiplier
@@ -90,6 +92,8 @@ class VideoProcessor:
         return {
             'fps': fps,
             'frame_count': frame_count,
+            'width': width,
+            'height': height,
             'duration': str(timedelta(seconds=int(duration))),
             'is_long': duration > self.one_minute,
             'speed_multiplier': speed_multiplier,
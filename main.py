@@ -6,7 +6,9 @@ from werkzeug.utils import secure_filename
 from service import PostureDetectionApp
 from load_video import VideoProcessor
 from load_model import InferenceModel, ModelLoadError
+from admission import AdmissionController, AdmissionRejected
 import logging
+import uuid
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -15,6 +17,9 @@ CORS(app)  # Enable CORS for all routes
 model_initialized = False
 model_instance = None
 
+# Admission control bounding the video work in flight across request threads
+admission_controller = AdmissionController()
+
 @app.route("/")
 def hello_world():
     """Return a message showing server is running with timestamp."""
@@ -57,6 +62,14 @@ def clean_up_files(*files):
             except Exception as e:
                 logger.error(f"Error cleaning up file {file}: {str(e)}")
 
+def rejection_response(error):
+    """Build a fast rejection response for a job refused by admission control"""
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status_code
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 def initialize_model():
     """Initialize the model if not already initialized"""
     global model_initialized, model_instance
@@ -65,6 +78,7 @@ def initialize_model():
             logger.info("Initializing model...")
             model_instance = InferenceModel('small640.pt')
             model_initialized = True
+            admission_controller.record_baseline()
             logger.info("Model initialized successfully")
         except ModelLoadError as e:
             logger.error(f"Model initialization failed: {str(e)}")
@@ -82,7 +96,8 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "message": "Service is running",
-            "model_status": "initialized" if model_initialized else "not initialized"
+            "model_status": "initialized" if model_initialized else "not initialized",
+            "admission": admission_controller.stats()
         }), 200
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -96,11 +111,20 @@ def health_check():
 def analyze_posture():
     filepath = None
     processed_path = None
+    ticket = None
+    job_succeeded = False
     
     try:
         # Ensure model is initialized
         if not model_initialized:
             initialize_model()
+        
+        # Shed load before reading the upload if there is no room for any job
+        if not admission_controller.has_capacity():
+            return rejection_response(AdmissionRejected(
+                "Server is at capacity, retry later",
+                retry_after=admission_controller.retry_after()
+            ))
             
         # Check if video file is present in request
         if 'video' not in request.files:
@@ -131,6 +155,14 @@ def analyze_posture():
             video_info = video_processor.get_video_info(filepath)
             logger.debug(f"Video info: {video_info}")
             
+            # Reserve work and memory budget for this job, or reject it
+            try:
+                ticket = admission_controller.admit(uuid.uuid4().hex, video_info)
+            except AdmissionRejected as e:
+                logger.warning(f"Rejected {filename}: {str(e)}")
+                clean_up_files(filepath)
+                return rejection_response(e)
+            
             # Process video (handles both conversion and speed adjustment)
             processed_path = video_processor.process_video(filepath)
             logger.debug(f"Processed video path: {processed_path}")
@@ -177,6 +209,7 @@ def analyze_posture():
             if processed_path and processed_path != filepath:
                 clean_up_files(processed_path)
             
+            job_succeeded = True
             return jsonify(response), 200
             
         except Exception as e:
@@ -188,6 +221,9 @@ def analyze_posture():
         # Clean up any files in case of error
         clean_up_files(filepath, processed_path)
         return jsonify({"error": str(e)}), 500
+    finally:
+        if ticket is not None:
+            admission_controller.release(ticket, succeeded=job_succeeded)
 
 @app.route('/download-video/<filename>', methods=['GET'])
 def download_video(filename):
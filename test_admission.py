@@ -0,0 +1,184 @@
+import pytest
+import admission
+from admission import AdmissionController, AdmissionRejected
+
+MB = 1024 * 1024
+
+
+class FakeProcess:
+    rss = 100 * MB
+
+    def __init__(self, pid):
+        pass
+
+    def memory_info(self):
+        return type('MemInfo', (), {'rss': FakeProcess.rss})()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    FakeProcess.rss = 100 * MB
+    monkeypatch.setattr(admission.psutil, 'Process', FakeProcess)
+    monkeypatch.setattr(admission, 'time', fake_clock)
+    return fake_clock
+
+
+def make_controller(**kwargs):
+    settings = dict(max_cost=1000, max_memory_mb=1024, job_base_memory_mb=100,
+                    frame_buffers=0, default_retry_after=30, min_job_cost=100,
+                    decode_weight=0)
+    settings.update(kwargs)
+    controller = AdmissionController(**settings)
+    controller.record_baseline()
+    return controller
+
+
+def video(megapixels, speed_multiplier=1):
+    # 1 megapixel frames, so frame_count is the model cost
+    return {'frame_count': megapixels * speed_multiplier, 'width': 1000, 'height': 1000,
+            'speed_multiplier': speed_multiplier}
+
+
+def test_explicit_zero_settings_are_respected(clock, monkeypatch):
+    monkeypatch.setenv("ADMISSION_FRAME_BUFFERS", "8")
+    monkeypatch.setenv("ADMISSION_DEFAULT_RETRY_AFTER", "30")
+    controller = AdmissionController(frame_buffers=0, default_retry_after=0)
+    assert controller.frame_buffers == 0
+    assert controller.default_retry_after == 0
+
+
+def test_estimate_cost_counts_speed_pass_decode(clock):
+    controller = make_controller(decode_weight=0.5)
+    assert controller.estimate_cost(video(100)) == pytest.approx(100)
+    # 400 original frames decoded at half weight, 100 left for the model
+    assert controller.estimate_cost(video(100, speed_multiplier=4)) == pytest.approx(300)
+
+
+def test_admit_up_to_budget_then_reject(clock):
+    controller = make_controller()
+    controller.admit('a', video(600))
+    controller.admit('b', video(400))
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.admit('c', video(1))
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == 30
+
+
+def test_memory_budget_rejects(clock):
+    controller = make_controller(job_base_memory_mb=600)
+    controller.admit('a', video(10))
+    with pytest.raises(AdmissionRejected):
+        controller.admit('b', video(10))
+
+
+def test_oversized_job_runs_alone(clock):
+    controller = make_controller()
+    ticket = controller.admit('big', video(5000))
+    assert ticket.cost == 1000
+    assert ticket.estimated_cost == 5000
+    with pytest.raises(AdmissionRejected):
+        controller.admit('small', video(1))
+    controller.release(ticket)
+    controller.admit('small', video(1))
+
+
+def test_oversized_job_waits_for_idle_server(clock):
+    controller = make_controller()
+    controller.admit('a', video(100))
+    with pytest.raises(AdmissionRejected):
+        controller.admit('big', video(5000))
+
+
+def test_has_capacity_uses_minimum_job_cost(clock):
+    controller = make_controller(min_job_cost=300)
+    assert controller.has_capacity()
+    controller.admit('a', video(750))
+    assert not controller.has_capacity()
+
+
+def test_release_twice_is_ignored(clock):
+    controller = make_controller()
+    ticket = controller.admit('a', video(500))
+    controller.admit('b', video(200))
+    controller.release(ticket)
+    controller.release(ticket)
+    assert controller.stats()['inflight_megapixels'] == 200
+    assert controller.stats()['jobs_in_flight'] == 1
+
+
+def test_throughput_is_aggregate_over_busy_time(clock):
+    controller = make_controller()
+    a = controller.admit('a', video(300))
+    b = controller.admit('b', video(300))
+    clock.now += 10
+    controller.release(a)
+    controller.release(b)
+    # Idle time does not count as busy time
+    clock.now += 100
+    assert controller.stats()['throughput_megapixels_per_sec'] == pytest.approx(60)
+
+
+def test_failed_jobs_do_not_count_as_completed_work(clock):
+    controller = make_controller()
+    failed = controller.admit('failed', video(900))
+    clock.now += 0.2
+    controller.release(failed, succeeded=False)
+    assert controller.stats()['throughput_megapixels_per_sec'] is None
+    assert controller.stats()['inflight_megapixels'] == 0
+
+    ok = controller.admit('ok', video(100))
+    clock.now += 9.8
+    controller.release(ok)
+    # Busy time of the failed job still counts
+    assert controller.stats()['throughput_megapixels_per_sec'] == pytest.approx(10)
+
+
+def test_retry_after_from_throughput_and_clamped(clock):
+    controller = make_controller(max_retry_after=60)
+    ticket = controller.admit('warmup', video(100))
+    clock.now += 10
+    controller.release(ticket)  # 10 megapixels per second
+
+    controller.admit('a', video(900))
+    # 200 megapixels over budget drain in 20s
+    assert controller.retry_after(300) == 20
+    # A job that fits still waits at least a second
+    assert controller.retry_after(50) == 1
+    controller.admit('b', video(100))
+    assert controller.retry_after(1000) == 60
+
+
+def test_retry_after_for_memory_rejection(clock):
+    controller = make_controller(job_base_memory_mb=512)
+    ticket = controller.admit('warmup', video(100))
+    clock.now += 10
+    controller.release(ticket)  # 10 megapixels per second
+
+    controller.admit('a', video(200))
+    controller.admit('b', video(200))
+    # Fitting another 512MB job needs half the in-flight work (400 megapixels) to drain
+    assert controller.retry_after(10, 512 * MB) == 20
+
+
+def test_idle_server_admits_despite_retained_rss(clock):
+    controller = make_controller()
+    ticket = controller.admit('a', video(100))
+    controller.release(ticket)
+    # The allocator kept memory well beyond the budget after the job
+    FakeProcess.rss = 5000 * MB
+    assert controller.stats()['jobs_in_flight'] == 0
+    assert controller.has_capacity()
+    controller.admit('b', video(100))
+    # With a job in flight the RSS backstop applies again
+    assert not controller.has_capacity()
+    with pytest.raises(AdmissionRejected):
+        controller.admit('c', video(100))